@@ -5,14 +5,13 @@ Supports Hebrew RTL text rendering with arabic-reshaper and python-bidi
 """
 
 import io
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 
-import matplotlib
-import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
 import numpy as np
 
-matplotlib.use("Agg")
-
 CHART_BACKGROUND = "#14181F"
 CHART_SURFACE = "#1A1D22"
 CHART_ACCENT = "#3AE478"
@@ -21,6 +20,18 @@ CHART_GRID = "#A0AEC0"
 CHART_TEXT = "#FFFFFF"
 CHART_DARK_TEXT = "#14181F"
 
+# The monthly chart is placed 6.3 in wide in the quote PDF; 150 dpi on a
+# 10 in figure already gives it ~240 effective dpi on the page.
+CHART_DPI = 150
+
+# Chart PNGs are decoded and re-deflated by reportlab when embedded in the
+# quote PDF, so spending zlib effort on them here only adds latency.
+PNG_COMPRESS_LEVEL = 1
+
+# Rendered PNGs kept per chart type; quotes for the same system size and
+# price render identical charts, e.g. when a PDF is previewed, sent, signed.
+CHART_CACHE_SIZE = 64
+
 try:
     import arabic_reshaper
     from bidi.algorithm import get_display
@@ -32,6 +43,8 @@ except ImportError as e:
     print(f"[WARNING] RTL text libraries not available: {e}")
     print("[INFO] Install with: pip install arabic-reshaper python-bidi")
 
+ARABIC_SCRIPT_RE = re.compile("[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]")
+
 
 def reshape_text_for_chart(text):
     if text is None:
@@ -43,13 +56,24 @@ def reshape_text_for_chart(text):
 
     if RTL_AVAILABLE:
         try:
-            return get_display(arabic_reshaper.reshape(text_str))
+            return shape_rtl(text_str)
         except Exception as e:
             print(f"[WARNING] RTL text processing error: {e}")
 
     return text_str
 
 
+# Axis labels, titles and the PDF's section headings repeat on every render;
+# shape each string once. pdf_generator shapes its text through this too.
+@lru_cache(maxsize=1024)
+def shape_rtl(text_str):
+    # arabic_reshaper only rewrites Arabic letter forms; Hebrew, Latin and
+    # digits come back unchanged, so go straight to the bidi pass for those.
+    if ARABIC_SCRIPT_RE.search(text_str):
+        text_str = arabic_reshaper.reshape(text_str)
+    return get_display(text_str)
+
+
 HEBREW_MONTHS_RAW = [
     "ינואר",
     "פברואר",
@@ -65,6 +89,15 @@ HEBREW_MONTHS_RAW = [
     "דצמבר",
 ]
 
+# Fixed labels are shaped once at import; only data-dependent strings
+# (titles with sizes, annotations with totals) go through bidi per render.
+HEBREW_MONTH_LABELS = tuple(reshape_text_for_chart(month) for month in HEBREW_MONTHS_RAW)
+MONTH_AXIS_LABEL = reshape_text_for_chart("חודש")
+PRODUCTION_AXIS_LABEL = reshape_text_for_chart("ייצור (קוט״ש)")
+YEARS_AXIS_LABEL = reshape_text_for_chart("שנים")
+SAVINGS_AXIS_LABEL = reshape_text_for_chart("חיסכון מצטבר (₪)")
+PAYBACK_TITLE = reshape_text_for_chart("תקופת החזר השקעה וחיסכון מצטבר")
+
 MONTHLY_COEFFICIENTS = [
     0.88,
     0.95,
@@ -91,6 +124,95 @@ DIRECTION_COEFFICIENTS = {
     "NW": 0.75,
 }
 
+DIRECTIONS = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+
+# float32 throughout: chart coordinates need nowhere near float64 precision.
+MONTHLY_COEFFICIENT_ARRAY = np.array(MONTHLY_COEFFICIENTS, dtype=np.float32)
+DIRECTION_COEFFICIENT_ARRAY = np.array([DIRECTION_COEFFICIENTS[d] for d in DIRECTIONS], dtype=np.float32)
+DIRECTION_COEFFICIENT_ARRAY_CLOSED = np.append(DIRECTION_COEFFICIENT_ARRAY, DIRECTION_COEFFICIENT_ARRAY[0])
+
+# Inner glow rings of the polar chart: radius scale (one row each) and alpha.
+DIRECTION_LAYER_SCALES = np.array([0.4, 0.6, 0.8], dtype=np.float32)[:, None]
+DIRECTION_LAYER_ALPHAS = (0.15, 0.25, 0.35)
+
+# Polar angle of each direction, with the first repeated to close the loop.
+DIRECTION_ANGLES = np.linspace(0, 2 * np.pi, len(DIRECTIONS), endpoint=False, dtype=np.float32)
+DIRECTION_ANGLES_CLOSED = np.append(DIRECTION_ANGLES, DIRECTION_ANGLES[0])
+
+
+# One Figure/Axes pair per chart type, cleared and redrawn on every call
+# instead of building and tearing down a new figure each time. Matplotlib
+# artists are not thread-safe, so a single lock serializes all renders.
+# matplotlib itself is imported on first use so that importing this module
+# (e.g. via pdf_generator at app start-up) stays cheap; Pillow likewise
+# loads only when the first PNG is encoded.
+_FIG_POOL = {"bar": None, "polar": None, "line": None}
+_FIG_POOL_LOCK = threading.Lock()
+
+
+@contextmanager
+def pooled_axes(kind, figsize, facecolor, projection=None, dpi=None):
+    with _FIG_POOL_LOCK:
+        entry = _FIG_POOL[kind]
+        if entry is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+
+            fig = Figure(figsize=figsize, dpi=dpi)
+            FigureCanvasAgg(fig)
+            fig.patch.set_facecolor(facecolor)
+            ax = fig.add_subplot(111, projection=projection)
+            entry = _FIG_POOL[kind] = (fig, ax)
+        else:
+            entry[1].clear()
+        yield entry
+
+
+def render_png(fig) -> io.BytesIO:
+    """Rasterize ``fig`` with Agg and encode the RGBA buffer straight to PNG.
+
+    Skips ``savefig`` and its tight-bbox pass, which lays the figure out and
+    draws it a second time; callers run ``tight_layout`` themselves.
+
+    The PNG is encoded for speed, since reportlab re-deflates it anyway. The
+    buffer comes back rewound; the chart functions keep its bytes in their
+    caches and wrap a fresh BytesIO around them for each caller.
+    """
+    from PIL import Image
+
+    canvas = fig.canvas
+    canvas.draw()
+    width, height = canvas.get_width_height(physical=True)
+    image = Image.frombuffer("RGBA", (width, height), canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    buf.seek(0)
+    return buf
+
+
+def set_fixed_yticklabels(ax, fmt):
+    """Label the current y ticks once instead of via a per-draw formatter.
+
+    Call after the data and limits are final; the view limits are restored
+    because pinning ticks outside them would otherwise widen the axis.
+    """
+    ylim = ax.get_ylim()
+    ticks = ax.get_yticks()
+    ax.set_yticks(ticks, labels=[fmt(tick) for tick in ticks])
+    ax.set_ylim(ylim)
+
+
+def format_thousands(x):
+    return f"{int(x):,}"
+
+
+def format_kilo(x):
+    return f"{int(x / 1000)}k"
+
+
+def format_shekels(x):
+    return f"₪{int(x / 1000)}k" if abs(x) >= 1000 else f"₪{int(x)}"
+
 
 def style_axes(ax):
     ax.set_facecolor(CHART_SURFACE)
@@ -102,218 +224,215 @@ def style_axes(ax):
         spine.set_linewidth(0.9)
 
 
+def quantize_chart_input(value):
+    # Two decimals is finer than anything the charts print, so nearby
+    # inputs share one cache entry without changing the rendered output.
+    return round(value, 2)
+
+
 def generate_monthly_production_chart(system_kwp: float, annual_production: float) -> bytes:
-    monthly_production = [(annual_production / 12) * coef for coef in MONTHLY_COEFFICIENTS]
-
-    fig, ax = plt.subplots(figsize=(10, 5.5))
-    fig.patch.set_facecolor(CHART_BACKGROUND)
-
-    bars = ax.bar(
-        range(12),
-        monthly_production,
-        color=CHART_ACCENT,
-        edgecolor=CHART_ACCENT_LIGHT,
-        linewidth=1.5,
-        width=0.75,
-        zorder=3,
+    return _render_monthly_production_chart(
+        quantize_chart_input(system_kwp), quantize_chart_input(annual_production)
     )
 
-    ax.bar(
-        range(12),
-        monthly_production,
-        color="#0F1318",
-        alpha=0.45,
-        width=0.75,
-        bottom=-max(monthly_production) * 0.02,
-        zorder=1,
-    )
 
-    for bar in bars:
-        height = bar.get_height()
-        gradient = mpatches.Rectangle(
-            (bar.get_x(), height * 0.6),
-            bar.get_width(),
-            height * 0.4,
-            facecolor=CHART_ACCENT_LIGHT,
+def generate_monthly_production_chart_stream(system_kwp: float, annual_production: float) -> io.BytesIO:
+    return io.BytesIO(generate_monthly_production_chart(system_kwp, annual_production))
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _render_monthly_production_chart(system_kwp, annual_production) -> bytes:
+    monthly_production = np.float32(annual_production / 12) * MONTHLY_COEFFICIENT_ARRAY
+
+    with pooled_axes("bar", (10, 5.5), CHART_BACKGROUND, dpi=CHART_DPI) as (fig, ax):
+        ax.bar(
+            range(12),
+            monthly_production,
+            color=CHART_ACCENT,
+            edgecolor=CHART_ACCENT_LIGHT,
+            linewidth=1.5,
+            width=0.75,
+            zorder=3,
+        )
+
+        ax.bar(
+            range(12),
+            monthly_production * 0.4,
+            bottom=monthly_production * 0.6,
+            color=CHART_ACCENT_LIGHT,
             edgecolor="none",
             alpha=0.22,
+            width=0.75,
             zorder=4,
         )
-        ax.add_patch(gradient)
-
-    ax.set_xlabel(reshape_text_for_chart("חודש"), fontsize=10, fontweight="700", labelpad=10, color=CHART_TEXT)
-    ax.set_ylabel(reshape_text_for_chart("ייצור (קוט״ש)"), fontsize=10, fontweight="700", labelpad=10, color=CHART_TEXT)
-
-    title_text = f"ייצור סולארי חודשי - מערכת {system_kwp} קילוואט"
-    ax.set_title(reshape_text_for_chart(title_text), fontsize=12, fontweight="bold", pad=15, color=CHART_TEXT)
-
-    ax.set_xticks(range(12))
-    ax.set_xticklabels(
-        [reshape_text_for_chart(month) for month in HEBREW_MONTHS_RAW],
-        rotation=45,
-        ha="right",
-        fontsize=9,
-        fontweight="500",
-        color=CHART_TEXT,
-    )
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f"{int(x):,}"))
-    style_axes(ax)
-
-    total_kwh = sum(monthly_production)
-    annotation_text = f"סה״כ: {total_kwh:,.0f} קוט״ש/שנה"
-    ax.text(
-        0.98,
-        0.97,
-        reshape_text_for_chart(annotation_text),
-        transform=ax.transAxes,
-        fontsize=9,
-        fontweight="700",
-        verticalalignment="top",
-        horizontalalignment="right",
-        color=CHART_DARK_TEXT,
-        bbox=dict(
-            boxstyle="round,pad=0.6",
-            facecolor=CHART_ACCENT,
-            edgecolor=CHART_ACCENT_LIGHT,
-            linewidth=1.5,
-            alpha=0.98,
-        ),
-    )
 
-    plt.tight_layout()
+        ax.set_xlabel(MONTH_AXIS_LABEL, fontsize=10, fontweight="700", labelpad=10, color=CHART_TEXT)
+        ax.set_ylabel(PRODUCTION_AXIS_LABEL, fontsize=10, fontweight="700", labelpad=10, color=CHART_TEXT)
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=180, bbox_inches="tight", facecolor=CHART_BACKGROUND)
-    buf.seek(0)
-    plt.close(fig)
-    return buf.getvalue()
+        title_text = f"ייצור סולארי חודשי - מערכת {system_kwp} קילוואט"
+        ax.set_title(reshape_text_for_chart(title_text), fontsize=12, fontweight="bold", pad=15, color=CHART_TEXT)
+
+        ax.set_xticks(range(12))
+        ax.set_xticklabels(
+            HEBREW_MONTH_LABELS,
+            rotation=45,
+            ha="right",
+            fontsize=9,
+            fontweight="500",
+            color=CHART_TEXT,
+        )
+        set_fixed_yticklabels(ax, format_thousands)
+        style_axes(ax)
+
+        total_kwh = monthly_production.sum()
+        annotation_text = f"סה״כ: {total_kwh:,.0f} קוט״ש/שנה"
+        ax.text(
+            0.98,
+            0.97,
+            reshape_text_for_chart(annotation_text),
+            transform=ax.transAxes,
+            fontsize=9,
+            fontweight="700",
+            verticalalignment="top",
+            horizontalalignment="right",
+            color=CHART_DARK_TEXT,
+            bbox=dict(
+                boxstyle="round,pad=0.6",
+                facecolor=CHART_ACCENT,
+                edgecolor=CHART_ACCENT_LIGHT,
+                linewidth=1.5,
+                alpha=0.98,
+            ),
+        )
+
+        fig.tight_layout()
+        return render_png(fig).getvalue()
 
 
 def generate_directional_production_chart(system_kwp: float, annual_production: float) -> bytes:
-    fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(projection="polar"))
-    fig.patch.set_facecolor(CHART_BACKGROUND)
-    ax.set_facecolor(CHART_BACKGROUND)
-
-    directions = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
-    angles = np.linspace(0, 2 * np.pi, len(directions), endpoint=False)
-    production_values = [annual_production * DIRECTION_COEFFICIENTS[d] for d in directions]
-    angles = np.concatenate((angles, [angles[0]]))
-    production_values.append(production_values[0])
-
-    shadow_values = [v * 0.95 for v in production_values]
-    ax.fill(angles, shadow_values, alpha=0.12, color="#0F1318", zorder=1)
-    ax.plot(angles, shadow_values, linewidth=1, color="#0F1318", alpha=0.25, zorder=1)
-
-    for i, alpha_val in enumerate([0.15, 0.25, 0.35]):
-        layer_values = [v * (0.4 + i * 0.2) for v in production_values]
-        ax.fill(angles, layer_values, alpha=alpha_val, color=CHART_ACCENT, zorder=2 + i)
-
-    ax.plot(
-        angles,
-        production_values,
-        "o-",
-        linewidth=3,
-        color=CHART_ACCENT,
-        markersize=10,
-        markeredgecolor=CHART_ACCENT_LIGHT,
-        markeredgewidth=2,
-        zorder=5,
-    )
-    ax.fill(angles, production_values, alpha=0.35, color=CHART_ACCENT_LIGHT, zorder=4)
-
-    ax.set_xticks(angles[:-1])
-    ax.set_xticklabels(directions, fontsize=13, fontweight="bold", color=CHART_TEXT)
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f"{int(x / 1000)}k"))
-    ax.tick_params(axis="y", labelsize=10, colors=CHART_TEXT)
-    ax.grid(True, linestyle="--", alpha=0.25, linewidth=0.7, color=CHART_GRID)
-    ax.set_ylim(0, max(production_values) * 1.1)
-    ax.spines["polar"].set_edgecolor(CHART_GRID)
-    ax.spines["polar"].set_linewidth(1.0)
-
-    title_text = f"ייצור שנתי לפי כיוון גג\nמערכת {system_kwp} קילוואט"
-    ax.set_title(reshape_text_for_chart(title_text), fontsize=14, fontweight="bold", pad=20, y=1.08, color=CHART_TEXT)
-
-    center_text = f"דרום\n{int(annual_production):,}\nקוט״ש/שנה"
-    ax.text(
-        0,
-        0,
-        reshape_text_for_chart(center_text),
-        ha="center",
-        va="center",
-        fontsize=11,
-        fontweight="bold",
-        color=CHART_DARK_TEXT,
-        bbox=dict(
-            boxstyle="round,pad=0.8",
-            facecolor=CHART_ACCENT,
-            edgecolor=CHART_ACCENT_LIGHT,
-            linewidth=2,
-            alpha=0.98,
-        ),
+    return _render_directional_production_chart(
+        quantize_chart_input(system_kwp), quantize_chart_input(annual_production)
     )
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=180, bbox_inches="tight", facecolor=CHART_BACKGROUND)
-    buf.seek(0)
-    plt.close(fig)
-    return buf.getvalue()
 
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _render_directional_production_chart(system_kwp, annual_production) -> bytes:
+    with pooled_axes("polar", (7, 8), CHART_BACKGROUND, projection="polar", dpi=CHART_DPI) as (fig, ax):
+        ax.set_facecolor(CHART_BACKGROUND)
+
+        angles = DIRECTION_ANGLES_CLOSED
+        production_values = np.float32(annual_production) * DIRECTION_COEFFICIENT_ARRAY_CLOSED
+
+        layers = production_values * DIRECTION_LAYER_SCALES
+        for i, (layer_values, alpha_val) in enumerate(zip(layers, DIRECTION_LAYER_ALPHAS)):
+            ax.fill(angles, layer_values, alpha=alpha_val, color=CHART_ACCENT, zorder=2 + i)
+
+        ax.plot(
+            angles,
+            production_values,
+            "o-",
+            linewidth=3,
+            color=CHART_ACCENT,
+            markersize=10,
+            markeredgecolor=CHART_ACCENT_LIGHT,
+            markeredgewidth=2,
+            zorder=5,
+        )
+        ax.fill(angles, production_values, alpha=0.35, color=CHART_ACCENT_LIGHT, zorder=4)
+
+        ax.set_xticks(DIRECTION_ANGLES)
+        ax.set_xticklabels(DIRECTIONS, fontsize=13, fontweight="bold", color=CHART_TEXT)
+        ax.tick_params(axis="y", labelsize=10, colors=CHART_TEXT)
+        ax.grid(True, linestyle="--", alpha=0.25, linewidth=0.7, color=CHART_GRID)
+        ax.set_ylim(0, production_values.max() * 1.1)
+        set_fixed_yticklabels(ax, format_kilo)
+        ax.spines["polar"].set_edgecolor(CHART_GRID)
+        ax.spines["polar"].set_linewidth(1.0)
+
+        title_text = f"ייצור שנתי לפי כיוון גג\nמערכת {system_kwp} קילוואט"
+        ax.set_title(reshape_text_for_chart(title_text), fontsize=14, fontweight="bold", pad=20, y=1.08, color=CHART_TEXT)
+
+        center_text = f"דרום\n{int(annual_production):,}\nקוט״ש/שנה"
+        ax.text(
+            0,
+            0,
+            reshape_text_for_chart(center_text),
+            ha="center",
+            va="center",
+            fontsize=11,
+            fontweight="bold",
+            color=CHART_DARK_TEXT,
+            bbox=dict(
+                boxstyle="round,pad=0.8",
+                facecolor=CHART_ACCENT,
+                edgecolor=CHART_ACCENT_LIGHT,
+                linewidth=2,
+                alpha=0.98,
+            ),
+        )
 
-def generate_payback_chart(price: float, annual_revenue: float, years: int = 25) -> bytes:
-    year_range = np.arange(0, years + 1)
-    cumulative_savings = annual_revenue * year_range - price
-    payback_years = price / annual_revenue if annual_revenue > 0 else 0
+        fig.subplots_adjust(left=0.08, right=0.92, bottom=0.05, top=0.84)
+        return render_png(fig).getvalue()
 
-    fig, ax = plt.subplots(figsize=(10, 4.5))
-    fig.patch.set_facecolor("white")
 
-    ax.plot(year_range, cumulative_savings, linewidth=2, color="#00358A", marker="o", markersize=3)
-    ax.fill_between(year_range, cumulative_savings, 0, where=(cumulative_savings <= 0), color="#ff4d4f", alpha=0.15, interpolate=True)
-    ax.fill_between(year_range, cumulative_savings, 0, where=(cumulative_savings >= 0), color="#00358A", alpha=0.15, interpolate=True)
-    ax.axhline(y=0, color="#4a5568", linestyle="-", linewidth=1, alpha=0.4)
+def generate_payback_chart(price: float, annual_revenue: float, years: int = 25) -> bytes:
+    return _render_payback_chart(quantize_chart_input(price), quantize_chart_input(annual_revenue), years)
 
-    if 0 < payback_years <= years:
-        payback_value = annual_revenue * payback_years - price
-        ax.plot(payback_years, payback_value, "r*", markersize=15, zorder=5)
-        ax.axvline(x=payback_years, color="#ef5350", linestyle="--", linewidth=1.2, alpha=0.6)
 
-        annotation_text = f"נקודת איזון\n{payback_years:.1f} שנים"
-        ax.annotate(
-            reshape_text_for_chart(annotation_text),
-            xy=(payback_years, 0),
-            xytext=(payback_years + 2, price * 0.3),
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _render_payback_chart(price, annual_revenue, years) -> bytes:
+    year_range = np.arange(0, years + 1, dtype=np.float32)
+    cumulative_savings = year_range * np.float32(annual_revenue)
+    cumulative_savings -= np.float32(price)
+    # Both masks include the zero crossing so the two fills meet there.
+    in_loss = cumulative_savings <= 0
+    in_profit = cumulative_savings >= 0
+    payback_years = price / annual_revenue if annual_revenue > 0 else 0
+
+    with pooled_axes("line", (10, 4.5), "white", dpi=CHART_DPI) as (fig, ax):
+        ax.plot(year_range, cumulative_savings, linewidth=2, color="#00358A", marker="o", markersize=3)
+        ax.fill_between(year_range, cumulative_savings, 0, where=in_loss, color="#ff4d4f", alpha=0.15, interpolate=True)
+        ax.fill_between(year_range, cumulative_savings, 0, where=in_profit, color="#00358A", alpha=0.15, interpolate=True)
+        ax.axhline(y=0, color="#4a5568", linestyle="-", linewidth=1, alpha=0.4)
+
+        if 0 < payback_years <= years:
+            payback_value = annual_revenue * payback_years - price
+            ax.plot(payback_years, payback_value, "r*", markersize=15, zorder=5)
+            ax.axvline(x=payback_years, color="#ef5350", linestyle="--", linewidth=1.2, alpha=0.6)
+
+            annotation_text = f"נקודת איזון\n{payback_years:.1f} שנים"
+            ax.annotate(
+                reshape_text_for_chart(annotation_text),
+                xy=(payback_years, 0),
+                xytext=(payback_years + 2, price * 0.3),
+                fontsize=8,
+                fontweight="600",
+                arrowprops=dict(arrowstyle="->", color="#ef5350", lw=1.5),
+                bbox=dict(boxstyle="round,pad=0.4", facecolor="#fff3e0", edgecolor="#ef5350", alpha=0.8),
+            )
+
+        ax.set_xlabel(YEARS_AXIS_LABEL, fontsize=9, fontweight="600", labelpad=8, color="#4a5568")
+        ax.set_ylabel(SAVINGS_AXIS_LABEL, fontsize=9, fontweight="600", labelpad=8, color="#4a5568")
+        ax.set_title(PAYBACK_TITLE, fontsize=10, fontweight="bold", pad=12, color="#2d3748")
+        set_fixed_yticklabels(ax, format_shekels)
+        ax.tick_params(axis="both", labelsize=8, colors="#4a5568")
+        ax.grid(True, alpha=0.2, linestyle="--", linewidth=0.5, color="#cbd5e0")
+        ax.set_axisbelow(True)
+
+        # Printed to the shekel, so take it from the exact inputs.
+        final_savings = annual_revenue * years - price
+        legend_text = f"חיסכון כולל ({years} שנים): ₪{final_savings:,.0f}"
+        ax.text(
+            0.98,
+            0.02,
+            reshape_text_for_chart(legend_text),
+            transform=ax.transAxes,
             fontsize=8,
             fontweight="600",
-            arrowprops=dict(arrowstyle="->", color="#ef5350", lw=1.5),
-            bbox=dict(boxstyle="round,pad=0.4", facecolor="#fff3e0", edgecolor="#ef5350", alpha=0.8),
+            verticalalignment="bottom",
+            horizontalalignment="right",
+            bbox=dict(boxstyle="round,pad=0.5", facecolor="#f7fafc", edgecolor="#cbd5e0", alpha=0.9),
         )
 
-    ax.set_xlabel(reshape_text_for_chart("שנים"), fontsize=9, fontweight="600", labelpad=8, color="#4a5568")
-    ax.set_ylabel(reshape_text_for_chart("חיסכון מצטבר (₪)"), fontsize=9, fontweight="600", labelpad=8, color="#4a5568")
-    ax.set_title(reshape_text_for_chart("תקופת החזר השקעה וחיסכון מצטבר"), fontsize=10, fontweight="bold", pad=12, color="#2d3748")
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f"₪{int(x / 1000)}k" if abs(x) >= 1000 else f"₪{int(x)}"))
-    ax.tick_params(axis="both", labelsize=8, colors="#4a5568")
-    ax.grid(True, alpha=0.2, linestyle="--", linewidth=0.5, color="#cbd5e0")
-    ax.set_axisbelow(True)
-
-    final_savings = cumulative_savings[-1]
-    legend_text = f"חיסכון כולל ({years} שנים): ₪{final_savings:,.0f}"
-    ax.text(
-        0.98,
-        0.02,
-        reshape_text_for_chart(legend_text),
-        transform=ax.transAxes,
-        fontsize=8,
-        fontweight="600",
-        verticalalignment="bottom",
-        horizontalalignment="right",
-        bbox=dict(boxstyle="round,pad=0.5", facecolor="#f7fafc", edgecolor="#cbd5e0", alpha=0.9),
-    )
-
-    plt.tight_layout()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=150, bbox_inches="tight", facecolor="white")
-    buf.seek(0)
-    plt.close(fig)
-    return buf.getvalue()
+        fig.tight_layout()
+        return render_png(fig).getvalue()
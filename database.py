@@ -1,12 +1,16 @@
 import hashlib
+import hmac
 import bcrypt
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from contextlib import contextmanager
 from typing import Optional
-import random
 import psycopg2
+from psycopg2.errors import UndefinedTable
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from quote_defaults import get_legacy_quote_text_defaults
 
 # PostgreSQL database configuration
@@ -17,29 +21,99 @@ if not DATABASE_URL:
 
 print("[DB] Using PostgreSQL database")
 
+# Connections are pooled per process: opening a fresh TLS connection to the
+# hosted database on every request costs several round trips.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Create the shared connection pool on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # TCP keepalives so idle pooled connections are not silently dropped
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    DATABASE_URL,
+                    keepalives=1,
+                    keepalives_idle=30,
+                    keepalives_interval=10,
+                    keepalives_count=3,
+                )
+    return _pool
+
+def acquire_connection():
+    """Borrow a pooled connection, or raise PoolError if all DB_POOL_MAX are out.
+
+    Never waits: the callers run on the event loop, where blocking until
+    another request hands a connection back would stall that request too.
+    Hand the connection back with pooled_connection(), or just use get_db().
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    if conn.closed:
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    return conn
+
 @contextmanager
-def get_db():
-    """Database connection context manager for PostgreSQL"""
-    conn = psycopg2.connect(DATABASE_URL)
+def pooled_connection(conn):
+    """Yield a connection from acquire_connection() and return it to the pool on exit"""
+    pool = _get_pool()
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # Don't hand a dead connection to the next request
+        broken = True
+        raise
     finally:
-        conn.close()
+        # putconn rolls back any transaction the caller left open
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+@contextmanager
+def get_db():
+    """Database connection context manager for PostgreSQL (borrows from the pool)"""
+    with pooled_connection(acquire_connection()) as conn:
+        yield conn
 
-def get_cursor(conn):
-    """Get PostgreSQL cursor with RealDictCursor factory"""
-    return conn.cursor(cursor_factory=RealDictCursor)
+def get_cursor(conn, cursor_factory=RealDictCursor):
+    """Get PostgreSQL cursor (RealDictCursor by default, None for plain tuples)"""
+    return conn.cursor(cursor_factory=cursor_factory)
 
-def init_database():
-    """Initialize PostgreSQL database with tables"""
-    print("[DB] Initializing PostgreSQL database...")
+# Bump whenever the tables, indexes or default rows in create_schema()
+# change, so databases created by an older build re-run it on next start.
+SCHEMA_VERSION = 2
+
+def schema_is_current(conn) -> bool:
+    """Check whether create_schema() has already run at SCHEMA_VERSION"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+    except UndefinedTable:
+        conn.rollback()
+        return False
+    version = cursor.fetchone()[0]
+    return version is not None and version >= SCHEMA_VERSION
+
+def create_schema():
+    """Create tables and indexes and insert default rows"""
     legacy_defaults = get_legacy_quote_text_defaults()
 
     with get_db() as conn:
         cursor = conn.cursor()
 
+        # All DDL goes to the server as one multi-statement batch (a single
+        # round trip) inside the same transaction as the seeds below.
+        schema = []
+
         # Users table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS users (
                 id SERIAL PRIMARY KEY,
                 email VARCHAR(255) UNIQUE NOT NULL,
@@ -51,7 +125,7 @@ def init_database():
         ''')
 
         # Sessions table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS sessions (
                 session_id VARCHAR(255) PRIMARY KEY,
                 user_id INTEGER NOT NULL,
@@ -63,13 +137,13 @@ def init_database():
             )
         ''')
 
-        cursor.execute('''
+        schema.append('''
             CREATE INDEX IF NOT EXISTS idx_sessions_expires_at
             ON sessions(expires_at)
         ''')
 
         # Quotes table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS quotes (
                 id SERIAL PRIMARY KEY,
                 quote_number VARCHAR(100) UNIQUE NOT NULL,
@@ -106,8 +180,22 @@ def init_database():
             )
         ''')
 
+        # Quote list is ordered newest first, with id as the keyset tie-break
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_quotes_created_at_id
+            ON quotes(created_at DESC, id DESC)
+        ''')
+
+        # Per-month quote number counter, see generate_quote_number()
+        schema.append('''
+            CREATE TABLE IF NOT EXISTS quote_seq (
+                month VARCHAR(6) PRIMARY KEY,
+                n INTEGER NOT NULL
+            )
+        ''')
+
         # Pricing parameters table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS pricing_parameters (
                 id SERIAL PRIMARY KEY,
                 price_per_kwp NUMERIC DEFAULT 4300,
@@ -134,7 +222,7 @@ def init_database():
         ''')
 
         # Company settings table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS company_settings (
                 id SERIAL PRIMARY KEY,
                 company_name VARCHAR(255) DEFAULT 'Solar Pro',
@@ -149,7 +237,7 @@ def init_database():
         ''')
 
         # Customer submissions table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS customer_submissions (
                 id SERIAL PRIMARY KEY,
                 customer_name VARCHAR(255) NOT NULL,
@@ -164,8 +252,27 @@ def init_database():
             )
         ''')
 
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_customer_submissions_submission_date
+            ON customer_submissions(submission_date DESC)
+        ''')
+
+        # Signature lookup by phone/email takes the latest submission; INCLUDE
+        # lets it be answered from the index alone
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_customer_submissions_phone_date
+            ON customer_submissions(customer_phone, submission_date DESC)
+            INCLUDE (signature_path)
+        ''')
+
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_customer_submissions_email_date
+            ON customer_submissions(customer_email, submission_date DESC)
+            INCLUDE (signature_path)
+        ''')
+
         # Quote signatures table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS quote_signatures (
                 id SERIAL PRIMARY KEY,
                 quote_id INTEGER NOT NULL,
@@ -184,7 +291,7 @@ def init_database():
         ''')
 
         # Roof designs table
-        cursor.execute('''
+        schema.append('''
             CREATE TABLE IF NOT EXISTS roof_designs (
                 id SERIAL PRIMARY KEY,
                 quote_id INTEGER,
@@ -214,52 +321,113 @@ def init_database():
             )
         ''')
 
-        conn.commit()
+        # Foreign-key columns: PostgreSQL does not index the referencing side,
+        # so deleting a user or quote would otherwise scan each child table
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_sessions_user_id
+            ON sessions(user_id)
+        ''')
 
-        # Insert default data
-        cursor.execute("SELECT COUNT(*) FROM pricing_parameters")
-        if cursor.fetchone()[0] == 0:
-            cursor.execute('''
-                INSERT INTO pricing_parameters
-                (
-                    price_per_kwp, production_per_kwp, tariff_rate, trees_multiplier, vat_rate,
-                    basic_assumptions_default, revenue_calculation_default, summary_default,
-                    environmental_impact_default
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                4300,
-                1360,
-                0.48,
-                0.05,
-                0.17,
-                legacy_defaults["basic_assumptions_default"],
-                legacy_defaults["revenue_calculation_default"],
-                legacy_defaults["summary_default"],
-                legacy_defaults["environmental_impact_default"],
-            ))
-            conn.commit()
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_quotes_created_by
+            ON quotes(created_by)
+        ''')
+
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_roof_designs_quote_id
+            ON roof_designs(quote_id)
+        ''')
+
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_roof_designs_created_by
+            ON roof_designs(created_by)
+        ''')
+
+        # Signature status/resend look up the latest request for a quote
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_quote_signatures_quote_created
+            ON quote_signatures(quote_id, created_at DESC)
+        ''')
+
+        # Roof design list is ordered newest first
+        schema.append('''
+            CREATE INDEX IF NOT EXISTS idx_roof_designs_created_at
+            ON roof_designs(created_at DESC)
+        ''')
+
+        schema.append('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute(";\n".join(schema))
+
+        # Insert default data (committed together with the schema below).
+        # Each seed is a single INSERT ... WHERE NOT EXISTS, so a populated
+        # database costs one statement per table instead of COUNT + INSERT.
+        cursor.execute('''
+            INSERT INTO pricing_parameters
+            (
+                price_per_kwp, production_per_kwp, tariff_rate, trees_multiplier, vat_rate,
+                basic_assumptions_default, revenue_calculation_default, summary_default,
+                environmental_impact_default
+            )
+            SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s
+            WHERE NOT EXISTS (SELECT 1 FROM pricing_parameters)
+        ''', (
+            4300,
+            1360,
+            0.48,
+            0.05,
+            0.17,
+            legacy_defaults["basic_assumptions_default"],
+            legacy_defaults["revenue_calculation_default"],
+            legacy_defaults["summary_default"],
+            legacy_defaults["environmental_impact_default"],
+        ))
+        if cursor.rowcount:
             print("[OK] Default pricing parameters created")
 
-        cursor.execute("SELECT COUNT(*) FROM company_settings")
-        if cursor.fetchone()[0] == 0:
-            cursor.execute('''
-                INSERT INTO company_settings
-                (company_name, company_email, primary_color, secondary_color)
-                VALUES (%s, %s, %s, %s)
-            ''', ('U Solar', 'usolarisrael@gmail.com', '#00358A', '#D9FF0D'))
-            conn.commit()
+        cursor.execute('''
+            INSERT INTO company_settings
+            (company_name, company_email, primary_color, secondary_color)
+            SELECT %s, %s, %s, %s
+            WHERE NOT EXISTS (SELECT 1 FROM company_settings)
+        ''', ('U Solar', 'usolarisrael@gmail.com', '#00358A', '#D9FF0D'))
+        if cursor.rowcount:
             print("[OK] Default company settings created")
 
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role=%s", ('ADMIN',))
-        if cursor.fetchone()[0] == 0:
-            hashed_password = hashlib.sha256("admin123".encode()).hexdigest()
+        # The admin seed keeps its existence check so the bcrypt hash is only
+        # computed when the row is actually going to be inserted.
+        cursor.execute("SELECT 1 FROM users WHERE role = %s LIMIT 1", ('ADMIN',))
+        if cursor.fetchone() is None:
+            hashed_password = hash_password("admin123")
             cursor.execute('''
                 INSERT INTO users (email, password, name, role)
                 VALUES (%s, %s, %s, %s)
+                ON CONFLICT (email) DO NOTHING
             ''', ('admin@solar.com', hashed_password, 'Admin User', 'ADMIN'))
-            conn.commit()
-            print("[OK] Default admin user created: admin@solar.com / admin123")
+            if cursor.rowcount:
+                print("[OK] Default admin user created: admin@solar.com / admin123")
+
+        cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (SCHEMA_VERSION,))
+
+        conn.commit()
+
+def init_database():
+    """Initialize PostgreSQL database with tables"""
+    print("[DB] Initializing PostgreSQL database...")
+
+    # A warm database costs one query here instead of the full DDL batch
+    with get_db() as conn:
+        current = schema_is_current(conn)
+
+    if current:
+        print(f"[DB] Schema already at version {SCHEMA_VERSION} - skipping table setup")
+    else:
+        create_schema()
 
     print("[OK] Database initialized successfully!")
 
@@ -299,10 +467,30 @@ def init_database():
     except Exception as e:
         print(f"[WARNING] Phase 5 migration failed: {e}")
 
+# bcrypt work factor. Each +1 doubles hash/verify time; 10 rounds is ~4x
+# cheaper per login than the library default of 12 and still far beyond
+# brute-force reach for this admin-only user base. Raise it via env if needed;
+# `python database.py --calibrate-bcrypt` measures a value for the host.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+
 def hash_password(password: str) -> str:
     """Hash password using bcrypt with SHA-256 pre-hash (handles any length)"""
     password_hash = hashlib.sha256(password.encode()).hexdigest()
-    return bcrypt.hashpw(password_hash.encode(), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password_hash.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def calibrate_bcrypt_rounds(target_seconds: float = 0.25, min_rounds: int = 10, max_rounds: int = 14) -> int:
+    """Largest bcrypt cost (>= min_rounds) whose hash takes at most target_seconds on this machine"""
+    sample = hashlib.sha256(b"calibration").hexdigest().encode()
+    rounds = min_rounds
+    for candidate in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(sample, bcrypt.gensalt(rounds=candidate))
+        elapsed = time.perf_counter() - start
+        print(f"[AUTH] bcrypt cost {candidate}: {elapsed * 1000:.0f} ms")
+        if elapsed > target_seconds:
+            break
+        rounds = candidate
+    return rounds
 
 def verify_password(password: str, hashed: str) -> bool:
     """Verify password against bcrypt with SHA-256 pre-hash or legacy hashes"""
@@ -311,16 +499,54 @@ def verify_password(password: str, hashed: str) -> bool:
             password_hash = hashlib.sha256(password.encode()).hexdigest()
             return bcrypt.checkpw(password_hash.encode(), hashed.encode())
         else:
-            return hashlib.sha256(password.encode()).hexdigest() == hashed
+            # Compare raw digests; no need to hex-encode the candidate
+            return hmac.compare_digest(hashlib.sha256(password.encode()).digest(), bytes.fromhex(hashed))
     except Exception as e:
         print(f"[AUTH] Password verification error: {e}")
         return False
 
-def generate_quote_number() -> str:
-    """Generate unique quote number"""
+def password_needs_rehash(hashed: str) -> bool:
+    """True for legacy SHA-256 hashes or bcrypt hashes below BCRYPT_ROUNDS, to be re-hashed on next login"""
+    if not hashed.startswith('$2'):
+        return True
+    try:
+        # $2b$<cost>$<salt+hash>; never weaken a hash stored at a higher cost
+        return int(hashed.split('$')[2]) < BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+# Quote numbers are SQ-YYYYMM-NNNN. The suffix comes from this month's row in
+# quote_seq, bumped inside the caller's transaction, so restarts and other
+# workers can never hand out the same number twice.
+def generate_quote_number(cursor) -> str:
+    """Generate the next quote number for this month.
+
+    Call it in the same transaction as the quote INSERT: the counter row
+    stays locked until that commits, and a rollback gives the number back.
+    A month's first quote seeds the counter past any numbers already stored
+    for that month.
+    """
     date_part = datetime.now().strftime("%Y%m")
-    random_part = f"{random.randint(1000, 9999):04d}"
-    return f"SQ-{date_part}-{random_part}"
+    with cursor.connection.cursor() as seq_cursor:
+        seq_cursor.execute(
+            "UPDATE quote_seq SET n = n + 1 WHERE month = %s RETURNING n",
+            (date_part,),
+        )
+        row = seq_cursor.fetchone()
+        if row is None:
+            seq_cursor.execute(
+                """
+                INSERT INTO quote_seq (month, n)
+                SELECT %s, GREATEST(1000, COALESCE(MAX(CAST(SPLIT_PART(quote_number, '-', 3) AS INTEGER)), 0) + 1)
+                FROM quotes
+                WHERE quote_number LIKE %s
+                ON CONFLICT (month) DO UPDATE SET n = quote_seq.n + 1
+                RETURNING n
+                """,
+                (date_part, f"SQ-{date_part}-%"),
+            )
+            row = seq_cursor.fetchone()
+    return f"SQ-{date_part}-{row[0]}"
 
 # Session management functions
 def create_session_db(user_id: int, email: str, role: str, session_id: str, expires_hours: int = 24) -> None:
@@ -336,21 +562,27 @@ def create_session_db(user_id: int, email: str, role: str, session_id: str, expi
         conn.commit()
         print(f"[SESSION] Created session for user {email} (expires in {expires_hours}h)")
 
+SESSION_COLUMNS = ("user_id", "email", "role", "created_at", "expires_at")
+
 def get_session_db(session_id: str) -> Optional[dict]:
     """Get session from database if valid and not expired"""
     if not session_id:
         return None
 
+    # Runs on every authenticated request; a plain tuple row is cheaper
+    # than a RealDictRow that gets copied into a dict anyway.
     with get_db() as conn:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = get_cursor(conn, cursor_factory=None)
         cursor.execute('''
             SELECT user_id, email, role, created_at, expires_at
             FROM sessions
             WHERE session_id = %s AND expires_at > NOW()
         ''', (session_id,))
 
-        session = cursor.fetchone()
-        return dict(session) if session else None
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return dict(zip(SESSION_COLUMNS, row))
 
 def delete_session_db(session_id: str) -> None:
     """Delete a session from the database"""
@@ -372,4 +604,9 @@ def cleanup_expired_sessions_db() -> int:
         return deleted_count
 
 if __name__ == "__main__":
-    init_database()
+    import sys
+
+    if "--calibrate-bcrypt" in sys.argv:
+        print(f"BCRYPT_ROUNDS={calibrate_bcrypt_rounds()}")
+    else:
+        init_database()
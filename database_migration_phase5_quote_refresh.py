@@ -8,58 +8,44 @@ from database import get_db
 from quote_defaults import get_legacy_quote_text_defaults
 
 
+def add_columns_sql(table, columns):
+    clauses = ", ".join(
+        f"ADD COLUMN IF NOT EXISTS {name} {column_type}" for name, column_type in columns.items()
+    )
+    return f"ALTER TABLE {table} {clauses}"
+
+
 def migrate_phase5_quote_refresh():
     print("[MIGRATION] Starting Phase 5 - Quote Refresh")
     legacy_defaults = get_legacy_quote_text_defaults()
 
     quote_columns = {
-        "maintenance": "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS maintenance TEXT",
-        "service": "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS service TEXT",
-        "system_value_after_25_years": (
-            "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS system_value_after_25_years NUMERIC"
-        ),
-        "basic_assumptions_text": (
-            "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS basic_assumptions_text TEXT"
-        ),
-        "revenue_calculation_text": (
-            "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS revenue_calculation_text TEXT"
-        ),
-        "summary_text": "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS summary_text TEXT",
-        "environmental_impact_text": (
-            "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS environmental_impact_text TEXT"
-        ),
-        "offer_image_path": (
-            "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS offer_image_path TEXT"
-        ),
-        "financial_metrics_overrides": (
-            "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS financial_metrics_overrides TEXT"
-        ),
+        "maintenance": "TEXT",
+        "service": "TEXT",
+        "system_value_after_25_years": "NUMERIC",
+        "basic_assumptions_text": "TEXT",
+        "revenue_calculation_text": "TEXT",
+        "summary_text": "TEXT",
+        "environmental_impact_text": "TEXT",
+        "offer_image_path": "TEXT",
+        "financial_metrics_overrides": "TEXT",
     }
 
     pricing_columns = {
-        "basic_assumptions_default": (
-            "ALTER TABLE pricing_parameters ADD COLUMN IF NOT EXISTS basic_assumptions_default TEXT"
-        ),
-        "revenue_calculation_default": (
-            "ALTER TABLE pricing_parameters ADD COLUMN IF NOT EXISTS revenue_calculation_default TEXT"
-        ),
-        "summary_default": (
-            "ALTER TABLE pricing_parameters ADD COLUMN IF NOT EXISTS summary_default TEXT"
-        ),
-        "environmental_impact_default": (
-            "ALTER TABLE pricing_parameters ADD COLUMN IF NOT EXISTS environmental_impact_default TEXT"
-        ),
+        "basic_assumptions_default": "TEXT",
+        "revenue_calculation_default": "TEXT",
+        "summary_default": "TEXT",
+        "environmental_impact_default": "TEXT",
     }
 
     try:
         with get_db() as conn:
             cursor = conn.cursor()
 
-            for sql in quote_columns.values():
-                cursor.execute(sql)
-
-            for sql in pricing_columns.values():
-                cursor.execute(sql)
+            # This runs on every start-up: one ALTER per table (each takes the
+            # table lock once) instead of one per column
+            cursor.execute(add_columns_sql("quotes", quote_columns))
+            cursor.execute(add_columns_sql("pricing_parameters", pricing_columns))
 
             cursor.execute("SELECT COUNT(*) FROM pricing_parameters")
             if cursor.fetchone()[0] == 0:
@@ -1,12 +1,17 @@
 from fastapi import FastAPI, Request, Form, HTTPException, Depends, Cookie, UploadFile, File
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
 from typing import Optional
-from contextlib import asynccontextmanager
+from psycopg2.errors import UniqueViolation
+from psycopg2.pool import PoolError
+from contextlib import asynccontextmanager, contextmanager
 import secrets
-from database import get_db, get_cursor, init_database, hash_password, verify_password, generate_quote_number, create_session_db, get_session_db, delete_session_db, cleanup_expired_sessions_db
+from database import acquire_connection, pooled_connection, get_cursor, init_database, hash_password, verify_password, password_needs_rehash, generate_quote_number, create_session_db, get_session_db, delete_session_db, cleanup_expired_sessions_db
 from datetime import datetime
 from decimal import Decimal
 import json
@@ -16,8 +21,11 @@ import traceback
 import re
 import io
 import glob
+import gzip
+import time
+import hashlib
 from urllib.parse import quote as url_quote
-from pdf_generator import generate_quote_pdf, generate_leasing_quote_pdf
+from pdf_generator import render_quote_pdf_bytes
 from quote_defaults import (
     QUOTE_TEXT_FIELD_MAP,
     LARGE_SYSTEM_THRESHOLD_KW,
@@ -42,7 +50,18 @@ from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileT
 import base64
 import asyncio
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+logger = logging.getLogger(__name__)
 
 # Detect if running in production (on Render or other HTTPS environment)
 IS_PRODUCTION = os.getenv("RENDER") is not None or os.getenv("PRODUCTION") is not None
@@ -58,6 +77,25 @@ SIGNATURES_DIR = os.path.join(PERSISTENT_UPLOADS_DIR, "quote_signatures")
 SIGNED_PDFS_DIR = os.path.join(PERSISTENT_UPLOADS_DIR, "signed_pdfs")
 QUOTE_IMAGES_DIR = os.path.join(PERSISTENT_UPLOADS_DIR, "quote_images")
 
+# Uploads are copied to disk in chunks of this size instead of read whole
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+DB_BUSY_DETAIL = "Server is busy, please retry"
+
+@contextmanager
+def get_db():
+    """database.get_db, but an exhausted pool becomes a 503, not a 500.
+
+    Raised as an HTTPException so the endpoints' `except HTTPException: raise`
+    blocks pass it through instead of wrapping it in a 500.
+    """
+    try:
+        conn = acquire_connection()
+    except PoolError:
+        raise HTTPException(status_code=503, detail=DB_BUSY_DETAIL, headers={"Retry-After": "1"})
+    with pooled_connection(conn) as conn:
+        yield conn
+
 # Detection job store for async SAM processing
 # Format: {job_id: {"status": "pending|running|completed|failed", "result": {...}, "error": str}}
 detection_jobs = {}
@@ -65,6 +103,71 @@ detection_jobs = {}
 # Thread pool for CPU-intensive SAM detection
 detection_executor = ThreadPoolExecutor(max_workers=2)
 
+# Process pool for PDF rendering: reportlab layout and the matplotlib chart are
+# pure-Python CPU work, so threads would just take turns on the GIL. Workers
+# are spawned (not forked) so they don't inherit the DB pool's sockets.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+
+def new_pdf_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=PDF_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+pdf_executor = new_pdf_executor()
+
+async def render_quote_pdf(quote_data, company_info=None, customer_signature_path=None):
+    """Render a quote PDF in the worker pool and return it as a BytesIO.
+
+    The layout follows quote_data's model_type: "leasing", else "purchase".
+    A worker that dies (e.g. OOM-killed) breaks the whole executor, so the
+    pool is replaced and the render retried once on the new one.
+    """
+    global pdf_executor
+    model_type = "leasing" if quote_data.get("model_type") == "leasing" else "purchase"
+    args = (render_quote_pdf_bytes, quote_data, company_info, customer_signature_path, model_type)
+    loop = asyncio.get_running_loop()
+    executor = pdf_executor
+    try:
+        pdf_bytes = await loop.run_in_executor(executor, *args)
+    except BrokenProcessPool:
+        # Concurrent renders all see the same broken pool; replace it only once
+        if pdf_executor is executor:
+            print("[PDF] Worker pool broken, starting a new one")
+            pdf_executor = new_pdf_executor()
+            executor.shutdown(wait=False)
+        pdf_bytes = await loop.run_in_executor(pdf_executor, *args)
+    return io.BytesIO(pdf_bytes)
+
+def save_upload(src, dest_path, max_size):
+    """Copy an upload to dest_path in chunks; returns False if it exceeds max_size.
+
+    Blocking file I/O, so call it through run_in_threadpool. The data goes to a
+    .part file first, so dest_path is only ever replaced by a complete upload.
+    """
+    tmp_path = f"{dest_path}.part"
+    total = 0
+    with open(tmp_path, "wb") as f:
+        while chunk := src.read(UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > max_size:
+                break
+            f.write(chunk)
+    if total > max_size:
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, dest_path)
+    return True
+
+def remove_file(path):
+    """Delete path if it is still there. Blocking, so call it through run_in_threadpool."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Error deleting file: {e}")
+
 def decimal_to_float(value):
     """Convert Decimal to float, or return value as-is if not Decimal"""
     if isinstance(value, Decimal):
@@ -75,6 +178,21 @@ def convert_decimals_in_dict(data: dict) -> dict:
     """Convert all Decimal values in a dictionary to floats"""
     return {key: decimal_to_float(val) for key, val in data.items()}
 
+def _orjson_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def json_response(content) -> Response:
+    """JSON response for large row payloads, bypassing FastAPI's jsonable_encoder pass.
+
+    Decimals are emitted as floats, like convert_decimals_in_dict. Uses orjson
+    (straight to bytes) when installed.
+    """
+    if orjson is not None:
+        return Response(orjson.dumps(content, default=_orjson_default), media_type="application/json")
+    return JSONResponse(content=jsonable_encoder(content, custom_encoder={Decimal: float}))
+
 def ensure_datetime(value):
     """Convert string to datetime if needed, or return datetime as-is"""
     if isinstance(value, str):
@@ -84,16 +202,18 @@ def ensure_datetime(value):
     else:
         raise ValueError(f"Expected datetime or str, got {type(value)}")
 
+# Anything outside printable ASCII, plus characters filesystems or the
+# Content-Disposition header choke on
+FILENAME_UNSAFE_RE = re.compile(r'[^\x20-\x7E]|[<>:"/\\|?*]')
+FILENAME_SPACES = str.maketrans(" ", "_")
+
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename by removing or replacing non-ASCII characters.
     This ensures the filename works in HTTP headers.
     """
-    # Remove non-ASCII characters and replace spaces with underscores
-    sanitized = re.sub(r'[^\x00-\x7F]+', '', filename)
-    sanitized = sanitized.replace(' ', '_')
-    # Remove any remaining problematic characters
-    sanitized = re.sub(r'[<>:"/\\|?*]', '', sanitized)
+    # Replace spaces with underscores, then drop everything unsafe in one pass
+    sanitized = FILENAME_UNSAFE_RE.sub('', filename.translate(FILENAME_SPACES))
     # If filename becomes empty after sanitization, use a default
     if not sanitized or sanitized == '.pdf':
         sanitized = 'Quote.pdf'
@@ -133,6 +253,55 @@ def get_latest_pricing(cursor):
     return convert_decimals_in_dict(dict(pricing)) if pricing else {}
 
 
+def get_latest_company(cursor):
+    cursor.execute("SELECT * FROM company_settings ORDER BY id DESC LIMIT 1")
+    company = cursor.fetchone()
+    return convert_decimals_in_dict(dict(company)) if company else {}
+
+
+# Pricing and company settings only change when an admin saves them, but the
+# calculator and settings pages read them on every request. Keep the latest
+# row in-process for a short TTL and drop it on save; the TTL bounds how stale
+# another worker process can be.
+SETTINGS_CACHE_TTL = 30
+_settings_cache = {}
+
+
+def get_cached_settings(key, loader):
+    """Return a copy of loader(cursor)'s row, re-querying once the TTL lapses."""
+    now = time.monotonic()
+    entry = _settings_cache.get(key)
+    if entry is None or now >= entry[1]:
+        with get_db() as conn:
+            entry = (loader(get_cursor(conn)), now + SETTINGS_CACHE_TTL)
+        _settings_cache[key] = entry
+    return dict(entry[0])
+
+
+def invalidate_settings_cache(key):
+    _settings_cache.pop(key, None)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
+def settings_response(request: Request, content):
+    """Send settings JSON with an ETag of the body, or a bare 304 if the client has it."""
+    # The ETag hashes the serialized body, not updated_at: parts of the payload
+    # come from code, and startup migrations rewrite rows without touching it.
+    response = JSONResponse(content=jsonable_encoder(content))
+    etag = f'W/"{hashlib.md5(response.body).hexdigest()}"'
+    # no-cache, not max-age: the admin panel re-reads right after saving, so
+    # the browser must revalidate, but a match costs no body and no DB read.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
 def calculate_quote_cashflow_25_years(quote_data: dict, pricing: dict) -> float:
     annual_revenue = float(quote_data.get("annual_revenue") or 0)
     total_price = float(quote_data.get("total_price") or 0)
@@ -396,17 +565,16 @@ def ensure_offer_image_column():
         with get_db() as conn:
             cursor = get_cursor(conn)
             cursor.execute(
-                "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS offer_image_path TEXT"
-            )
-            cursor.execute(
-                "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS financial_metrics_overrides TEXT"
+                """
+                ALTER TABLE quotes
+                ADD COLUMN IF NOT EXISTS offer_image_path TEXT,
+                ADD COLUMN IF NOT EXISTS financial_metrics_overrides TEXT,
+                ADD COLUMN IF NOT EXISTS urban_premium BOOLEAN DEFAULT FALSE
+                """
             )
             cursor.execute(
                 "ALTER TABLE pricing_parameters ADD COLUMN IF NOT EXISTS financial_metrics_config TEXT"
             )
-            cursor.execute(
-                "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS urban_premium BOOLEAN DEFAULT FALSE"
-            )
             # Upgrade the stored single-rate tariff wording to the tiered wording
             # (idempotent: the LIKE stops matching once replaced). Preserves any
             # custom prose around the parenthetical.
@@ -440,6 +608,10 @@ async def lifespan(app: FastAPI):
     # Cleanup expired sessions on startup
     cleanup_expired_sessions_db()
 
+    # Compile every template now rather than on each page's first request
+    for template_name in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(template_name)
+
     # AI detection via HuggingFace Space with local fallback
     print("[*] AI roof detection: HuggingFace SAM space with local contour fallback")
     print("[*] HF Space: https://huggingface.co/spaces/ramankamran/mobilesam-roof-api")
@@ -452,19 +624,83 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown (if needed)
     print("[*] Shutting down...")
+    pdf_executor.shutdown(wait=False, cancel_futures=True)
 
 # Initialize FastAPI app
 app = FastAPI(title="Solar Quotation System", lifespan=lifespan)
 
-# Configure CORS for widget embedding
+@app.exception_handler(PoolError)
+async def pool_exhausted_handler(request: Request, exc: PoolError):
+    """database.py helpers (sessions) raise PoolError directly"""
+    return JSONResponse(status_code=503, content={"detail": DB_BUSY_DETAIL}, headers={"Retry-After": "1"})
+
+# Configure CORS for widget embedding. CORS_ORIGINS is a comma-separated
+# list of embedding sites; cookies are only allowed for an explicit list,
+# since with "*" Starlette would echo any origin back on credentialed calls.
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific domains
-    allow_credentials=True,
+    allow_origins=CORS_ORIGINS,
+    allow_credentials="*" not in CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Only these are worth gzipping; PDFs and images are compressed already
+GZIP_CONTENT_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+class TextGZipMiddleware:
+    """Gzip JSON and text responses of at least minimum_size bytes.
+
+    Starlette's GZipMiddleware compresses every content type, so PDF
+    downloads and uploaded images paid for a pass that saved nothing.
+    Streamed bodies are passed through as they are.
+    """
+
+    def __init__(self, app, minimum_size=1024, compresslevel=5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_maybe_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if headers.get("content-type", "").startswith(GZIP_CONTENT_TYPES) and "content-encoding" not in headers:
+                    start = message  # held until we've seen the body
+                else:
+                    passthrough = True
+                    await send(message)
+            else:
+                passthrough = True
+                body = message.get("body", b"")
+                if message.get("more_body", False) or len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                compressed = gzip.compress(body, compresslevel=self.compresslevel)
+                headers = MutableHeaders(raw=list(start["headers"]))
+                headers["Content-Encoding"] = "gzip"
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                await send({**start, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_maybe_compressed)
+
+# Quote lists and settings JSON compress several-fold; small bodies aren't worth it
+app.add_middleware(TextGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Ensure upload directories exist before mounting (required at import time)
 for directory in [UPLOADS_DIR, ROOF_IMAGES_DIR, ROOF_VISUALIZATIONS_DIR, SIGNATURES_DIR, SIGNED_PDFS_DIR, QUOTE_IMAGES_DIR]:
     os.makedirs(directory, exist_ok=True)
@@ -476,8 +712,10 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 if os.getenv("RENDER"):
     app.mount("/uploads", StaticFiles(directory=PERSISTENT_UPLOADS_DIR), name="uploads")
 
-# Templates
+# Templates; in production they never change under a running process, so
+# skip the per-render mtime check
 templates = Jinja2Templates(directory="templates")
+templates.env.auto_reload = not IS_PRODUCTION
 
 
 def _compute_asset_version() -> str:
@@ -546,24 +784,39 @@ async def login(email: str = Form(...), password: str = Form(...)):
     """Handle login"""
     with get_db() as conn:
         cursor = get_cursor(conn)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+        cursor.execute("SELECT id, email, role, password FROM users WHERE email = %s LIMIT 1", (email,))
         user = cursor.fetchone()
 
-        if not user or not verify_password(password, user["password"]):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-
-        session_id = create_session(user["id"], user["email"], user["role"])
-        response = RedirectResponse(url="/dashboard", status_code=303)
-        # Set secure cookie with proper settings
-        response.set_cookie(
-            key="session_id",
-            value=session_id,
-            httponly=True,
-            secure=IS_PRODUCTION,  # Only send over HTTPS in production
-            samesite="lax",  # CSRF protection
-            max_age=86400  # 24 hours
-        )
-        return response
+    # bcrypt is deliberately slow and releases the GIL, so run it on the
+    # threadpool rather than stalling the event loop for every login, and
+    # without a pooled connection checked out.
+    if not user or not await run_in_threadpool(verify_password, password, user["password"]):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Upgrade legacy or under-cost hashes now that we have the plaintext
+    if password_needs_rehash(user["password"]):
+        hashed_password = await run_in_threadpool(hash_password, password)
+        with get_db() as conn:
+            cursor = get_cursor(conn)
+            cursor.execute(
+                "UPDATE users SET password = %s WHERE id = %s",
+                (hashed_password, user["id"]),
+            )
+            conn.commit()
+        print(f"[AUTH] Re-hashed password for {user['email']}")
+
+    session_id = create_session(user["id"], user["email"], user["role"])
+    response = RedirectResponse(url="/dashboard", status_code=303)
+    # Set secure cookie with proper settings
+    response.set_cookie(
+        key="session_id",
+        value=session_id,
+        httponly=True,
+        secure=IS_PRODUCTION,  # Only send over HTTPS in production
+        samesite="lax",  # CSRF protection
+        max_age=86400  # 24 hours
+    )
+    return response
 
 @app.get("/logout")
 async def logout(session_id: Optional[str] = Cookie(None)):
@@ -638,18 +891,16 @@ async def submissions_page(request: Request, user=Depends(get_current_user)):
     return response
 
 @app.get("/api/pricing")
-async def get_pricing():
+async def get_pricing(request: Request):
     """Get current pricing parameters"""
-    with get_db() as conn:
-        cursor = get_cursor(conn)
-        pricing = get_latest_pricing(cursor)
+    pricing = get_cached_settings("pricing", get_latest_pricing)
     # Expose the effective cube config (falls back to defaults) plus the
     # calculation catalog so the admin panel can render the cube manager.
     pricing["metrics_config"] = get_metrics_config(pricing)
     pricing["metrics_catalog"] = [
         {"key": key, "label": label} for key, label in AVAILABLE_CALCULATIONS
     ]
-    return pricing
+    return settings_response(request, pricing)
 
 @app.post("/api/pricing")
 async def update_pricing(
@@ -842,6 +1093,7 @@ async def update_pricing(
             merged["financial_metrics_config"],
         ))
         conn.commit()
+        invalidate_settings_cache("pricing")
         return {"message": "Settings updated successfully"}
 
 @app.post("/api/calculate")
@@ -850,10 +1102,7 @@ async def calculate_quote(
     urban_premium: bool = Form(False),
 ):
     """Calculate quote based on system size"""
-    with get_db() as conn:
-        cursor = get_cursor(conn)
-        cursor.execute("SELECT * FROM pricing_parameters ORDER BY id DESC LIMIT 1")
-        params = convert_decimals_in_dict(dict(cursor.fetchone()))
+    params = get_cached_settings("pricing", get_latest_pricing)
 
     total_price = system_size * params["price_per_kwp"]
     annual_production = system_size * params["production_per_kwp"]
@@ -904,7 +1153,7 @@ async def create_quote(request: Request, user=Depends(get_current_user)):
             )
             RETURNING id
         ''', (
-            generate_quote_number(),
+            generate_quote_number(cursor),
             data.get("customer_name"),
             data.get("customer_phone"),
             data.get("customer_email"),
@@ -939,23 +1188,64 @@ async def create_quote(request: Request, user=Depends(get_current_user)):
 
     return {"message": "Quote created successfully", "quote_id": quote_id}
 
+# Upper bound for ?limit= on the quote list
+MAX_QUOTES_PAGE_SIZE = 200
+
+def encode_quotes_cursor(quote) -> str:
+    """Page cursor for the quote list: the last row's "<created_at>|<id>" sort key"""
+    return f"{quote['created_at'].isoformat()}|{quote['id']}"
+
+def decode_quotes_cursor(cursor: str) -> tuple:
+    """Parse encode_quotes_cursor() output back into (created_at, id); 400 if malformed"""
+    created_at, _, quote_id = cursor.rpartition("|")
+    try:
+        return datetime.fromisoformat(created_at), int(quote_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/quotes")
-async def list_quotes(user=Depends(get_current_user)):
-    """List all quotes"""
+async def list_quotes(
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    user=Depends(get_current_user)
+):
+    """List quotes newest first; pass limit (and next_cursor as before) to page"""
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
+    # History table columns only; the long text and override columns are
+    # fetched per quote by get_quote when one is opened
+    query = '''
+        SELECT q.id, q.quote_number, q.customer_name, q.customer_phone, q.customer_email,
+               q.system_size, q.total_price, q.model_type, q.status, q.created_by, q.created_at,
+               u.name as created_by_name
+        FROM quotes q
+        LEFT JOIN users u ON q.created_by = u.id
+    '''
+    params = []
+    if before is not None:
+        # Keyset: continue after the last quote of the previous page. The
+        # cursor carries its sort key, so deleting that quote doesn't end paging.
+        query += '''
+        WHERE (q.created_at, q.id) < (%s, %s)
+        '''
+        params.extend(decode_quotes_cursor(before))
+    query += '''
+        ORDER BY q.created_at DESC, q.id DESC
+    '''
+    if limit is not None:
+        limit = max(1, min(limit, MAX_QUOTES_PAGE_SIZE))
+        query += " LIMIT %s"
+        params.append(limit)
+
     with get_db() as conn:
         cursor = get_cursor(conn)
-        cursor.execute('''
-            SELECT q.*, u.name as created_by_name
-            FROM quotes q
-            LEFT JOIN users u ON q.created_by = u.id
-            ORDER BY q.created_at DESC
-        ''')
-        quotes = [convert_decimals_in_dict(dict(row)) for row in cursor.fetchall()]
+        cursor.execute(query, params)
+        quotes = cursor.fetchall()
 
-    return {"quotes": quotes}
+    # Rows go straight to the serializer: no per-row dict copy or Decimal pass
+    next_cursor = encode_quotes_cursor(quotes[-1]) if limit is not None and len(quotes) == limit else None
+    return json_response({"quotes": quotes, "next_cursor": next_cursor})
 
 @app.get("/api/quotes/{quote_id}")
 async def get_quote(quote_id: int, user=Depends(get_current_user)):
@@ -994,13 +1284,9 @@ async def delete_quote(quote_id: int, user=Depends(get_current_user)):
     return {"message": "Quote deleted successfully"}
 
 @app.get("/api/company")
-async def get_company():
+async def get_company(request: Request):
     """Get company settings"""
-    with get_db() as conn:
-        cursor = get_cursor(conn)
-        cursor.execute("SELECT * FROM company_settings ORDER BY id DESC LIMIT 1")
-        company = cursor.fetchone()
-        return convert_decimals_in_dict(dict(company)) if company else {}
+    return settings_response(request, get_cached_settings("company", get_latest_company))
 
 @app.post("/api/company")
 async def update_company(
@@ -1025,6 +1311,7 @@ async def update_company(
             updated_at = CURRENT_TIMESTAMP
         ''', (company_name, company_phone, company_email, company_address))
         conn.commit()
+    invalidate_settings_cache("company")
 
     return {"message": "Company settings updated successfully"}
 
@@ -1039,11 +1326,6 @@ async def upload_logo(logo: UploadFile = File(...), user=Depends(get_current_use
     if logo.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Invalid file type. Only PNG, JPG, and SVG are allowed.")
 
-    # Validate file size (max 5MB)
-    content = await logo.read()
-    if len(content) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB.")
-
     # Use configured uploads directory
     uploads_dir = UPLOADS_DIR
 
@@ -1052,9 +1334,9 @@ async def upload_logo(logo: UploadFile = File(...), user=Depends(get_current_use
     filename = f"logo.{file_extension}"
     file_path = os.path.join(uploads_dir, filename)
 
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Save file (max 5MB), off the event loop
+    if not await run_in_threadpool(save_upload, logo.file, file_path, 5 * 1024 * 1024):
+        raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB.")
 
     # Update database with logo path
     logo_url = f"/uploads/uploads/{filename}" if os.getenv("RENDER") else f"/static/uploads/{filename}"
@@ -1066,6 +1348,7 @@ async def upload_logo(logo: UploadFile = File(...), user=Depends(get_current_use
             updated_at = CURRENT_TIMESTAMP
         ''', (logo_url,))
         conn.commit()
+    invalidate_settings_cache("company")
 
     return {"message": "Logo uploaded successfully", "logo_url": logo_url}
 
@@ -1082,18 +1365,6 @@ async def delete_logo(user=Depends(get_current_user)):
         cursor.execute("SELECT company_logo FROM company_settings ORDER BY id DESC LIMIT 1")
         result = cursor.fetchone()
 
-        if result and result['company_logo']:
-            logo_path = result['company_logo']
-
-            # Delete file if exists
-            if logo_path.startswith('/static/'):
-                file_path = logo_path[1:]  # Remove leading slash
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        print(f"Error deleting file: {e}")
-
         # Update database
         cursor.execute('''
             UPDATE company_settings SET
@@ -1101,6 +1372,12 @@ async def delete_logo(user=Depends(get_current_user)):
             updated_at = CURRENT_TIMESTAMP
         ''')
         conn.commit()
+    invalidate_settings_cache("company")
+
+    # Delete the file once the connection is back in the pool
+    logo_path = result['company_logo'] if result else None
+    if logo_path and logo_path.startswith('/static/'):
+        await run_in_threadpool(remove_file, logo_path[1:])  # Remove leading slash
 
     return {"message": "Logo deleted successfully"}
 
@@ -1114,16 +1391,12 @@ async def upload_quote_image(image: UploadFile = File(...), user=Depends(get_cur
     if image.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Invalid file type. Only PNG and JPG are allowed.")
 
-    content = await image.read()
-    if len(content) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB.")
-
     file_extension = image.filename.rsplit('.', 1)[-1].lower() if '.' in image.filename else 'png'
     filename = f"quote_image_{user['user_id']}_{int(datetime.now().timestamp())}.{file_extension}"
     file_path = os.path.join(QUOTE_IMAGES_DIR, filename)
 
-    with open(file_path, "wb") as f:
-        f.write(content)
+    if not await run_in_threadpool(save_upload, image.file, file_path, 5 * 1024 * 1024):
+        raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB.")
 
     image_url = (
         f"/uploads/quote_images/{filename}"
@@ -1163,19 +1436,18 @@ async def create_user(
     if len(password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
 
-    # Check if email already exists
+    # Hash before taking a pooled connection; the unique email index
+    # doubles as the existence check, so this is a single statement
+    hashed_password = await run_in_threadpool(hash_password, password)
     with get_db() as conn:
         cursor = get_cursor(conn)
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Email already exists")
-
-        # Create user with hashed password
-        hashed_password = hash_password(password)
         cursor.execute('''
             INSERT INTO users (email, password, name, role)
             VALUES (%s, %s, %s, %s)
+            ON CONFLICT (email) DO NOTHING
         ''', (email, hashed_password, name, role))
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=400, detail="Email already exists")
         conn.commit()
 
         print(f"[USER-CREATE] New user created: {email} with role: {role}")
@@ -1199,39 +1471,25 @@ async def update_user(
     if not name or not email or not role:
         raise HTTPException(status_code=400, detail="Name, email, and role are required")
 
+    hashed_password = await run_in_threadpool(hash_password, password) if password else None
+
     with get_db() as conn:
         cursor = get_cursor(conn)
-
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # Check if email already exists for another user
-        cursor.execute("SELECT id FROM users WHERE email = %s AND id != %s", (email, user_id))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Email already exists")
-
-        # Update user
-        if password:
-            hashed_password = hash_password(password)
+        # A NULL password keeps the current hash; the unique email index
+        # rejects an address that belongs to another user
+        try:
             cursor.execute('''
                 UPDATE users SET
                 email = %s,
-                password = %s,
+                password = COALESCE(%s, password),
                 name = %s,
                 role = %s
                 WHERE id = %s
             ''', (email, hashed_password, name, role, user_id))
-        else:
-            cursor.execute('''
-                UPDATE users SET
-                email = %s,
-                name = %s,
-                role = %s
-                WHERE id = %s
-            ''', (email, name, role, user_id))
-
+        except UniqueViolation:
+            raise HTTPException(status_code=400, detail="Email already exists")
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="User not found")
         conn.commit()
 
     return {"message": "User updated successfully"}
@@ -1249,13 +1507,9 @@ async def delete_user(user_id: int, user=Depends(get_current_user)):
     with get_db() as conn:
         cursor = get_cursor(conn)
 
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # Delete user
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="User not found")
         conn.commit()
 
     return {"message": "User deleted successfully"}
@@ -1297,17 +1551,14 @@ async def update_submission(
     with get_db() as conn:
         cursor = get_cursor(conn)
 
-        # Check if submission exists
-        cursor.execute("SELECT id FROM customer_submissions WHERE id = %s", (submission_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Submission not found")
-
-        # Update submission
         cursor.execute("""
             UPDATE customer_submissions
-            SET status = ?, notes = ?
-            WHERE id = ?
+            SET status = %s, notes = %s
+            WHERE id = %s
+            RETURNING id
         """, (status, notes, submission_id))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Submission not found")
         conn.commit()
 
     return {"message": "Submission updated successfully"}
@@ -1321,24 +1572,24 @@ async def delete_submission(submission_id: int, user=Depends(get_current_user)):
     with get_db() as conn:
         cursor = get_cursor(conn)
 
-        # Get signature path before deleting
-        cursor.execute("SELECT signature_path FROM customer_submissions WHERE id = %s", (submission_id,))
+        # Delete submission, getting its signature path back in the same statement
+        cursor.execute(
+            "DELETE FROM customer_submissions WHERE id = %s RETURNING signature_path",
+            (submission_id,)
+        )
         result = cursor.fetchone()
 
         if not result:
             raise HTTPException(status_code=404, detail="Submission not found")
-
-        # Delete signature file if exists
-        if result['signature_path'] and os.path.exists(result['signature_path']):
-            try:
-                os.remove(result['signature_path'])
-            except Exception as e:
-                print(f"Error deleting signature file: {e}")
-
-        # Delete submission
-        cursor.execute("DELETE FROM customer_submissions WHERE id = %s", (submission_id,))
         conn.commit()
 
+    # Delete signature file if exists
+    if result['signature_path'] and os.path.exists(result['signature_path']):
+        try:
+            os.remove(result['signature_path'])
+        except Exception as e:
+            print(f"Error deleting signature file: {e}")
+
     return {"message": "Submission deleted successfully"}
 
 @app.get("/api/quotes/{quote_id}/pdf")
@@ -1363,18 +1614,17 @@ async def generate_pdf(quote_id: int, user=Depends(get_current_user)):
             if not quote:
                 raise HTTPException(status_code=404, detail="Quote not found")
 
-            # Get company settings
-            cursor.execute("SELECT * FROM company_settings ORDER BY id DESC LIMIT 1")
-            company = cursor.fetchone()
-            pricing = get_latest_pricing(cursor)
+        # Company and pricing come from the settings cache, so a warm cache
+        # leaves the quote lookup as the only query for this request
+        pricing = get_cached_settings("pricing", get_latest_pricing)
+        quote_data = enrich_quote_render_data(convert_decimals_in_dict(dict(quote)), pricing)
+        company_info = get_cached_settings("company", get_latest_company) or None
 
-            # Convert to dict and handle Decimals
-            quote_data = enrich_quote_render_data(convert_decimals_in_dict(dict(quote)), pricing)
-            company_info = convert_decimals_in_dict(dict(company)) if company else None
-
-        print(f"[PDF] Generating PDF for quote #{quote_data.get('quote_number')}")
-        print(f"[PDF] Customer: {quote_data.get('customer_name')}")
-        print(f"[PDF] System size: {quote_data.get('system_size')}, Annual production: {quote_data.get('annual_production')}")
+        logger.debug(
+            "[PDF] Generating PDF for quote #%s (customer: %s, system size: %s, annual production: %s)",
+            quote_data.get('quote_number'), quote_data.get('customer_name'),
+            quote_data.get('system_size'), quote_data.get('annual_production'),
+        )
 
         # Find customer signature if available
         customer_signature_path = find_customer_signature(
@@ -1384,13 +1634,8 @@ async def generate_pdf(quote_id: int, user=Depends(get_current_user)):
 
         # Generate PDF based on model type
         try:
-            model_type = quote_data.get('model_type', 'purchase')
-            if model_type == 'leasing':
-                pdf_buffer = generate_leasing_quote_pdf(quote_data, company_info, customer_signature_path)
-                print(f"[PDF] Successfully generated LEASING PDF for quote #{quote_data.get('quote_number')}")
-            else:
-                pdf_buffer = generate_quote_pdf(quote_data, company_info, customer_signature_path)
-                print(f"[PDF] Successfully generated PURCHASE PDF for quote #{quote_data.get('quote_number')}")
+            pdf_buffer = await render_quote_pdf(quote_data, company_info, customer_signature_path)
+            logger.debug("[PDF] Generated %s PDF for quote #%s", quote_data.get('model_type'), quote_data.get('quote_number'))
         except Exception as pdf_error:
             print(f"[ERROR] PDF generation failed: {type(pdf_error).__name__}: {str(pdf_error)}")
             traceback.print_exc()
@@ -1407,8 +1652,8 @@ async def generate_pdf(quote_id: int, user=Depends(get_current_user)):
         # For browsers that support UTF-8 filenames, also provide the encoded version
         encoded_filename = url_quote(raw_filename)
 
-        return StreamingResponse(
-            pdf_buffer,
+        return Response(
+            content=pdf_buffer.getvalue(),
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename={safe_filename}; filename*=UTF-8''{encoded_filename}"
@@ -1447,14 +1692,10 @@ async def send_quote_email(quote_id: int, user=Depends(get_current_user)):
             if not quote:
                 raise HTTPException(status_code=404, detail="Quote not found")
 
-            # Get company settings
-            cursor.execute("SELECT * FROM company_settings ORDER BY id DESC LIMIT 1")
-            company = cursor.fetchone()
-
-            # Convert to dict and handle Decimals
-            pricing = get_latest_pricing(cursor)
-            quote_data = enrich_quote_render_data(convert_decimals_in_dict(dict(quote)), pricing)
-            company_info = convert_decimals_in_dict(dict(company)) if company else {}
+        # Company and pricing come from the settings cache, as in generate_pdf
+        pricing = get_cached_settings("pricing", get_latest_pricing)
+        quote_data = enrich_quote_render_data(convert_decimals_in_dict(dict(quote)), pricing)
+        company_info = get_cached_settings("company", get_latest_company)
 
         # Check if customer email exists
         if not quote_data.get('customer_email'):
@@ -1469,14 +1710,10 @@ async def send_quote_email(quote_id: int, user=Depends(get_current_user)):
         )
 
         # Generate PDF
-        model_type = quote_data.get('model_type', 'purchase')
-        if model_type == 'leasing':
-            pdf_buffer = generate_leasing_quote_pdf(quote_data, company_info, customer_signature_path)
-        else:
-            pdf_buffer = generate_quote_pdf(quote_data, company_info, customer_signature_path)
+        pdf_buffer = await render_quote_pdf(quote_data, company_info, customer_signature_path)
 
         # Send email with PDF attachment
-        email_sent = send_quote_pdf_email(quote_data, company_info, pdf_buffer, customer_signature_path)
+        email_sent = await run_in_threadpool(send_quote_pdf_email, quote_data, company_info, pdf_buffer, customer_signature_path)
 
         if email_sent:
             return JSONResponse(content={
@@ -1505,7 +1742,10 @@ async def generate_signature_link(quote_id: int, user=Depends(get_current_user))
             cursor = get_cursor(conn)
 
             # Get quote data
-            cursor.execute("SELECT * FROM quotes WHERE id = %s", (quote_id,))
+            cursor.execute(
+                "SELECT quote_number, customer_name, customer_email FROM quotes WHERE id = %s",
+                (quote_id,)
+            )
             quote = cursor.fetchone()
 
             if not quote:
@@ -1582,7 +1822,8 @@ async def get_signature_status(quote_id: int, user=Depends(get_current_user)):
             cursor = get_cursor(conn)
 
             cursor.execute('''
-                SELECT * FROM quote_signatures
+                SELECT status, viewed_at, signed_at, expires_at, signature_token
+                FROM quote_signatures
                 WHERE quote_id = %s
                 ORDER BY created_at DESC LIMIT 1
             ''', (quote_id,))
@@ -2034,7 +2275,7 @@ async def submit_contact(
 
         # Send email notification without signature (don't fail if email fails)
         print(f"[EMAIL] Attempting to send email notification for {customer_name}")
-        email_sent = send_email_notification(customer_data, None)  # No signature path
+        email_sent = await run_in_threadpool(send_email_notification, customer_data, None)  # No signature path
         if email_sent:
             print(f"[EMAIL] Email notification sent successfully")
         else:
@@ -2179,23 +2420,16 @@ async def preview_quote_pdf(token: str):
             if expires_at < datetime.now():
                 raise HTTPException(status_code=400, detail="Signature link has expired")
 
-            # Get company settings
-            cursor.execute("SELECT * FROM company_settings ORDER BY id DESC LIMIT 1")
-            company = cursor.fetchone()
-            company_info = convert_decimals_in_dict(dict(company)) if company else None
-            pricing = get_latest_pricing(cursor)
-            sig_data = enrich_quote_render_data(sig_data, pricing)
+        company_info = get_cached_settings("company", get_latest_company) or None
+        pricing = get_cached_settings("pricing", get_latest_pricing)
+        sig_data = enrich_quote_render_data(sig_data, pricing)
 
         # Generate PDF (without customer signature since they haven't signed yet)
-        model_type = sig_data.get('model_type', 'purchase')
-        if model_type == 'leasing':
-            pdf_buffer = generate_leasing_quote_pdf(sig_data, company_info, None)
-        else:
-            pdf_buffer = generate_quote_pdf(sig_data, company_info, None)
+        pdf_buffer = await render_quote_pdf(sig_data, company_info)
 
         # Return PDF for inline viewing
-        return StreamingResponse(
-            pdf_buffer,
+        return Response(
+            content=pdf_buffer.getvalue(),
             media_type="application/pdf",
             headers={
                 "Content-Disposition": "inline"
@@ -2238,11 +2472,8 @@ async def view_signed_pdf(token: str):
                 raise HTTPException(status_code=404, detail="Signed PDF not found")
 
         # Return signed PDF for inline viewing
-        with open(signed_pdf_path, "rb") as pdf_file:
-            pdf_content = pdf_file.read()
-
-        return StreamingResponse(
-            io.BytesIO(pdf_content),
+        return FileResponse(
+            signed_pdf_path,
             media_type="application/pdf",
             headers={
                 "Content-Disposition": "inline"
@@ -2298,37 +2529,17 @@ async def submit_signature(token: str, signature: UploadFile = File(...), reques
             with open(signature_path, "wb") as buffer:
                 shutil.copyfileobj(signature.file, buffer)
 
-            # Get client IP
-            client_ip = request.client.host if request else "unknown"
-            user_agent = request.headers.get("user-agent", "unknown") if request else "unknown"
-
-            # Update signature record
-            cursor.execute('''
-                UPDATE quote_signatures
-                SET signature_path = %s,
-                    status = 'signed',
-                    signed_at = %s,
-                    customer_ip = %s,
-                    customer_user_agent = %s
-                WHERE signature_token = %s
-            ''', (signature_path, datetime.now(), client_ip, user_agent, token))
-            conn.commit()
-
-            print(f"[SIGNATURE] Customer signed quote #{quote_number}")
+        # Get client IP
+        client_ip = request.client.host if request else "unknown"
+        user_agent = request.headers.get("user-agent", "unknown") if request else "unknown"
 
-            # Get company info for PDF generation
-            cursor.execute("SELECT * FROM company_settings ORDER BY id DESC LIMIT 1")
-            company = cursor.fetchone()
-            company_info = convert_decimals_in_dict(dict(company)) if company else {}
-            pricing = get_latest_pricing(cursor)
-            sig_data = enrich_quote_render_data(convert_decimals_in_dict(sig_data), pricing)
+        # Get company info for PDF generation
+        company_info = get_cached_settings("company", get_latest_company)
+        pricing = get_cached_settings("pricing", get_latest_pricing)
+        sig_data = enrich_quote_render_data(convert_decimals_in_dict(sig_data), pricing)
 
         # Generate signed PDF with customer signature
-        model_type = sig_data.get('model_type', 'purchase')
-        if model_type == 'leasing':
-            pdf_buffer = generate_leasing_quote_pdf(sig_data, company_info, signature_path)
-        else:
-            pdf_buffer = generate_quote_pdf(sig_data, company_info, signature_path)
+        pdf_buffer = await render_quote_pdf(sig_data, company_info, signature_path)
 
         # Use configured signed PDFs directory
         signed_pdfs_dir = SIGNED_PDFS_DIR
@@ -2340,18 +2551,31 @@ async def submit_signature(token: str, signature: UploadFile = File(...), reques
             pdf_buffer.seek(0)
             f.write(pdf_buffer.read())
 
-        # Update signature record with signed PDF path
+        # Mark the request signed only once the signed PDF exists, so a failed
+        # render leaves it pending and the customer can submit again
         with get_db() as conn:
             cursor = get_cursor(conn)
             cursor.execute('''
                 UPDATE quote_signatures
-                SET signed_pdf_path = %s
-                WHERE signature_token = %s
-            ''', (signed_pdf_path, token))
+                SET signature_path = %s,
+                    signed_pdf_path = %s,
+                    status = 'signed',
+                    signed_at = %s,
+                    customer_ip = %s,
+                    customer_user_agent = %s
+                WHERE signature_token = %s AND status IS DISTINCT FROM 'signed'
+            ''', (signature_path, signed_pdf_path, datetime.now(), client_ip, user_agent, token))
+            signed = cursor.rowcount
             conn.commit()
 
+        if not signed:
+            # A concurrent submission for the same link got there first
+            raise HTTPException(status_code=400, detail="Quote already signed")
+
+        print(f"[SIGNATURE] Customer signed quote #{quote_number}")
+
         # Send email notification to admin with signed PDF
-        send_admin_signed_quote_notification(sig_data, company_info, pdf_buffer, signature_path, signed_pdf_path)
+        await run_in_threadpool(send_admin_signed_quote_notification, sig_data, company_info, pdf_buffer, signature_path, signed_pdf_path)
 
         # Generate URL for viewing signed PDF
         signed_pdf_url = f"/sign/{token}/signed-pdf"
@@ -3410,18 +3634,14 @@ async def download_roof_visualization(
                     conn.rollback()
                     # Non-fatal: continue serving the file even if the update fails
 
-            # Read the image file
-            with open(resolved_path, 'rb') as img_file:
-                image_data = img_file.read()
-
             # Create safe filename
             safe_customer_name = sanitize_filename(customer_name) if customer_name else "design"
             ext = os.path.splitext(resolved_path)[1] or ".jpg"
             filename = f"roof_design_{safe_customer_name}_{design_id}{ext}"
 
             # Return image as downloadable attachment
-            return StreamingResponse(
-                io.BytesIO(image_data),
+            return FileResponse(
+                resolved_path,
                 media_type=f"image/{ext.lstrip('.').lower()}" if ext else "image/jpeg",
                 headers={
                     "Content-Disposition": f"attachment; filename={filename}"
@@ -3580,8 +3800,8 @@ async def get_satellite_image_endpoint(
             )
 
         # Return image
-        return StreamingResponse(
-            io.BytesIO(image_data),
+        return Response(
+            content=image_data,
             media_type="image/jpeg",
             headers={
                 "Cache-Control": "public, max-age=86400"  # Cache for 24 hours
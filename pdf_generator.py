@@ -25,7 +25,7 @@ from reportlab.platypus import (
 from reportlab.platypus.doctemplate import BaseDocTemplate, PageTemplate
 from reportlab.platypus.frames import Frame
 
-from chart_generator import generate_monthly_production_chart
+from chart_generator import RTL_AVAILABLE, generate_monthly_production_chart_stream, shape_rtl
 from quote_defaults import (
     QUOTE_ACCENT,
     QUOTE_BACKGROUND,
@@ -38,18 +38,6 @@ from quote_defaults import (
 from metrics_catalog import resolve_metrics
 
 
-try:
-    import arabic_reshaper
-    from bidi.algorithm import get_display
-
-    RTL_AVAILABLE = True
-except ImportError:
-    RTL_AVAILABLE = False
-
-    def get_display(text):
-        return text
-
-
 def reshape_hebrew(text):
     if text is None:
         return ""
@@ -69,7 +57,7 @@ def reshape_hebrew(text):
         return text_str
 
     try:
-        return get_display(arabic_reshaper.reshape(text_str))
+        return shape_rtl(text_str)
     except Exception:
         return text_str
 
@@ -851,8 +839,8 @@ def generate_quote_pdf_base(quote_data, company_info=None, customer_signature_pa
         elements.append(Paragraph(rtl("ייצור אנרגיה חודשי"), styles["heading"]))
         elements.append(Spacer(1, 0.04 * inch))
         try:
-            chart_bytes = generate_monthly_production_chart(system_size, annual_production)
-            chart_image = Image(BytesIO(chart_bytes), width=6.3 * inch, height=2.6 * inch)
+            chart_png = generate_monthly_production_chart_stream(system_size, annual_production)
+            chart_image = Image(chart_png, width=6.3 * inch, height=2.6 * inch)
             elements.append(chart_image)
             elements.append(Spacer(1, 0.06 * inch))
         except Exception:
@@ -969,3 +957,13 @@ def generate_leasing_quote_pdf(quote_data, company_info=None, customer_signature
         customer_signature_path=customer_signature_path,
         model_type="leasing",
     )
+
+
+def render_quote_pdf_bytes(quote_data, company_info=None, customer_signature_path=None, model_type="purchase"):
+    """Render a quote PDF and return its bytes (picklable, for worker processes)."""
+    return generate_quote_pdf_base(
+        quote_data,
+        company_info=company_info,
+        customer_signature_path=customer_signature_path,
+        model_type=model_type,
+    ).getvalue()
@@ -15,6 +15,9 @@ from typing import Dict
 SAM3_API_URL = "https://ramankamran-mobilesam-roof-api.hf.space/detect-roof"
 API_TIMEOUT = 180  # timeout for API calls (HF Spaces can cold-start)
 
+# Shared session so repeated detections reuse the TLS connection to the Space
+_session = requests.Session()
+
 
 def auto_detect_roof_boundary(image_path: str, max_candidates: int = 1) -> Dict:
     """
@@ -45,7 +48,7 @@ def auto_detect_roof_boundary(image_path: str, max_candidates: int = 1) -> Dict:
             }
 
             # Call the HF Space API with original image
-            response = requests.post(
+            response = _session.post(
                 SAM3_API_URL,
                 files=files,
                 timeout=API_TIMEOUT